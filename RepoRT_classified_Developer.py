@@ -3,11 +3,16 @@ import shutil
 from pathlib import Path
 from temporal.Optimiced_Alternative_Parents import optimiced_alternative_parents
 
-def RepoRT_classified_Developer(classified_path, lines_per_block, output_file="repoRT_joint.tsv"):
+def RepoRT_classified_Developer(classified_path, lines_per_block, output_file="repoRT_joint.tsv", reader="python",
+                                resume=False, layout="wide", memory_budget=None):
     final_file = optimiced_alternative_parents(
         classified_path=classified_path,
         lines_per_block=lines_per_block, 
-        out_path=output_file
+        out_path=output_file,
+        reader=reader,
+        resume=resume,
+        layout=layout,
+        memory_budget=memory_budget
     )
 
 
@@ -34,13 +39,50 @@ if __name__ == "__main__":
     parser.add_argument(
         "--blocksize",
         type=int,
-        default=6000000,
-        help="Number of lines per processing block"
+        default=100000,
+        help="Number of lines per processing block. A checkpoint is saved after every block, so this is also "
+             "how much work --resume can lose (all_classified.tsv has ~5M lines: ~50 checkpoints by default)"
+    )
+
+    parser.add_argument(
+        "--reader",
+        type=str,
+        choices=["python", "arrow"],
+        default="python",
+        help="Backend used to read the classified file: 'python' (line by line) or 'arrow' (pyarrow multithreaded blocks)"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its last checkpoint instead of starting from line 0"
+    )
+
+    parser.add_argument(
+        "--layout",
+        type=str,
+        choices=["wide", "star"],
+        default="wide",
+        help="Output layout: 'wide' (one file, classification copied on every measurement) or 'star' "
+             "(molecules, studies and measurements tables in <output_file>_star/)"
+    )
+
+    parser.add_argument(
+        "--memory-budget",
+        type=str,
+        default=None,
+        help="Memory budget for the run (e.g. 4G, 512M). Blocks are then sized in bytes and adjusted to stay "
+             "under it, ignoring --blocksize. Cannot be combined with --resume, because the block boundaries "
+             "(and so the output bytes) depend on the measured memory"
     )
 
     args = parser.parse_args()
 
     RepoRT_classified_Developer(
         classified_path=args.classified,
-        lines_per_block=args.blocksize
+        lines_per_block=args.blocksize,
+        reader=args.reader,
+        resume=args.resume,
+        layout=args.layout,
+        memory_budget=args.memory_budget
     )
@@ -1,5 +1,7 @@
 from contextlib import nullcontext
 
+import re
+
 import pandas as pd
 from glob import glob
 import numpy as np
@@ -56,17 +58,109 @@ def access_data(pattern="", location=".*", training=True):
         if column is not None and column.size == 0:
             print(f"{location} not found")
         elif results:
-            df_data = pd.concat(results, axis=0, ignore_index=True)
-            df_data["alternative_parents"] = (df_data.iloc[:, 14:].astype(str)
-                                              .apply(lambda x: ", ".join(x.drop_duplicates()), axis=1))
-            df_data = (df_data.drop(columns=df_data.columns[14:287]).replace("NA (NA)", np.nan)
-                       .set_index(df_data["id"].str[0:4].astype(int)))
-            # formula_inchi = df_data[df_data["formula"] != df_data["inchi.std"].str.split("/", expand=False).str[1]]
-            # df_data["formula"] = df_data["inchi.std"].str.split("/", expand=False).str[1]
-            column_data = Gradient_data.gradient_data(training)
-            df = pd.merge(df_data, column_data, left_index=True, right_index=True, how="inner")
-            return df
+            return merge_gradient(pd.concat(results, axis=0, ignore_index=True), training)
         else:
             print(f'No matches found with {pattern}')
     except Exception as e:
         print(f"Error:{e}")
+
+
+def merge_gradient(df_data, training=True, pattern=None):
+    """
+    Joins the alternative parents of the matched molecules and merges them with their chromatographic information.
+
+    Args:
+        df_data (DataFrame): Concatenated rows matched in the RepoRT files.
+        training (bool, optional): Indicates whether training data processing is performed. Default value True.
+        pattern (list, optional): Pattern that matched each row of `df_data`, added as the first column.
+        Default value None, no column is added.
+
+    Returns:
+        DataFrame: Processed DataFrame containing the merged data with its chromatographic information.
+    """
+    df_data["alternative_parents"] = (df_data.iloc[:, 14:].astype(str)
+                                      .apply(lambda x: ", ".join(x.drop_duplicates()), axis=1))
+    study = df_data["id"].str[0:4].astype(int)
+    df_data = df_data.drop(columns=df_data.columns[14:287]).replace("NA (NA)", np.nan)
+    if pattern is not None:
+        df_data.insert(0, "pattern", list(pattern))
+    df_data = df_data.set_index(study)
+    # formula_inchi = df_data[df_data["formula"] != df_data["inchi.std"].str.split("/", expand=False).str[1]]
+    # df_data["formula"] = df_data["inchi.std"].str.split("/", expand=False).str[1]
+    column_data = Gradient_data.gradient_data(training)
+    df = pd.merge(df_data, column_data, left_index=True, right_index=True, how="inner")
+    return df
+
+
+def access_data_batch(patterns, location=".*", training=True):
+    """
+    Accesses RepoRT data based on several molecule patterns in a single pass.
+
+    All the patterns (names, formulas, CHEMONTIDs...) are combined into one compiled, case-insensitive regex,
+    so every text column of every file is scanned once regardless of the number of patterns. Only the rows
+    that match the combined regex are then checked with one vectorized search per pattern to know which
+    ones hit. Patterns are case-insensitive, so the ones that only differ in case are searched once.
+
+    Args:
+        patterns (list): Literal patterns to search for in the data.
+        location (str, optional): Column name to search for the patterns. Default value ".*", representing all columns.
+        training (bool, optional): Indicates whether training data processing is performed. Default value True.
+
+    Returns:
+        DataFrame: Processed DataFrame like the one of `access_data`, with one row per matched row and pattern
+        and a "pattern" column with the pattern that hit, spelled as it was first given.
+    """
+    if isinstance(patterns, str):
+        raise TypeError("patterns must be a list of patterns, not a single string (use access_data for one pattern)")
+    try:
+        # Sin distinguir mayúsculas, pero se etiqueta con la primera forma en que se pasó cada patrón
+        unique = {}
+        for p in patterns:
+            if p:
+                unique.setdefault(p.lower(), p)
+        patterns = list(unique.values())
+        if not patterns:
+            print("No patterns given")
+            return None
+        # Los patrones más largos primero para que la alternancia no se quede con un prefijo
+        combined = re.compile("|".join(re.escape(p) for p in sorted(patterns, key=len, reverse=True)),
+                              flags=re.IGNORECASE)
+        compiled = [re.compile(re.escape(p), flags=re.IGNORECASE) for p in patterns]
+
+        directory = glob("../external/RepoRT/processed_data/*/*.tsv")
+        results = []
+        hits = []
+        matched_rows = 0
+        column = None
+
+        for file in directory:
+            rt = pd.read_csv(file, sep='\t', header=0, encoding='utf-8')
+            if "classyfire.kingdom" in rt.columns and not is_isomeric(rt['smiles.std'].iloc[0]):
+                column = rt.filter(regex=f'{location}', axis=1)
+                column_string = column.select_dtypes(include=['object', 'string'])
+                if column_string.empty:
+                    continue
+                mask = np.zeros(len(rt), dtype=bool)
+                for col in column_string.columns:
+                    mask |= column_string[col].str.contains(combined, na=False).to_numpy()
+                if not mask.any():
+                    continue
+                query = rt[mask]
+                text = column_string[mask].fillna("").astype(str).agg("\t".join, axis=1)
+                # Filas x patrones; nonzero recorre por filas, así se conserva el orden de las filas
+                matrix = np.column_stack([text.str.contains(c, na=False).to_numpy() for c in compiled])
+                rows, cols = np.nonzero(matrix)
+                hits.extend(zip((matched_rows + rows).tolist(), (patterns[c] for c in cols)))
+                results.append(query)
+                matched_rows += len(query)
+
+        if column is not None and column.size == 0:
+            print(f"{location} not found")
+        elif results:
+            df_data = pd.concat(results, axis=0, ignore_index=True)
+            df_data = df_data.iloc[[pos for pos, _ in hits]].reset_index(drop=True)
+            return merge_gradient(df_data, training, pattern=[p for _, p in hits])
+        else:
+            print(f'No matches found with {patterns}')
+    except Exception as e:
+        print(f"Error:{e}")
@@ -2,6 +2,7 @@ import re
 import pandas as pd
 from glob import glob
 import os
+import unicodedata
 import numpy as np
 
 
@@ -137,13 +138,79 @@ def training_data(df, drop_file, flowrate_null):
         print(f"Error training:{e}")
 
 
+# Factor para pasar la concentración de cada aditivo a % según su unidad. Las unidades en % no se tocan.
+UNIT_CONVERSION = {
+    "nh4ac": {"mM": 0.007},
+    "nh4form": {"mM": 0.005},
+    "nh4carb": {"mM": 0.006},
+    "nh4bicarb": {"mM": 0.005},
+    "nh4oh": {"mM": 0.004},
+    "phosphor": {"µM": 5.21 / (10 ** 6)},
+    "medronic": {"µM": 8.38 / (10 ** 6)},
+}
+
+_METADATA_CACHE = {}
+
+
+def _normalize_unit(unit):
+    # "µ" (micro) y "μ" (mu griega) se escriben indistintamente en los metadatos
+    return unicodedata.normalize("NFKC", str(unit)).strip()
+
+
+def normalize_units(df_metadata):
+    """
+    Converts every eluent additive to % using the `UNIT_CONVERSION` registry.
+
+    The unit of each value is taken from its "<column>.unit" column and all the columns are scaled in a single
+    vectorized operation. Values whose unit is not % and is not in the registry are left as they are and
+    reported.
+
+    Args:
+        df_metadata (DataFrame): Metadata of every experiment.
+
+    Returns:
+        DataFrame: Metadata with the additive concentrations in %.
+    """
+    unit_cols = [col for col in df_metadata.columns if col.endswith(".unit")]
+    value_cols = [col[:-len(".unit")] if col[:-len(".unit")] in df_metadata.columns
+                  else df_metadata.columns[df_metadata.columns.get_loc(col) - 1] for col in unit_cols]
+    additives = {}
+    for col in value_cols:
+        additives[col] = next((name for name in UNIT_CONVERSION if name in col), col.split(".")[-1])
+    registry = pd.Series({(additive, _normalize_unit(unit)): factor
+                          for additive, units in UNIT_CONVERSION.items() for unit, factor in units.items()},
+                         dtype=float)
+    if registry.empty or not unit_cols:
+        return df_metadata
+
+    units = df_metadata[unit_cols].copy()
+    units.columns = value_cols
+    stacked = units.stack().dropna().map(_normalize_unit)
+    value_level = stacked.index.get_level_values(1)
+    keys = pd.MultiIndex.from_arrays([value_level.map(additives), stacked.to_numpy()])
+    factors = pd.Series(registry.reindex(keys).to_numpy(), index=stacked.index)
+    factors[stacked == "%"] = 1.0
+
+    unknown = stacked[factors.isnull()]
+    if not unknown.empty:
+        counts = unknown.groupby([unknown.index.get_level_values(1), unknown.to_numpy()]).size()
+        for (col, unit), n in counts.items():
+            print(f"Unidad desconocida '{unit}' en {col} ({n} experimentos): valores sin convertir")
+
+    factors = factors.fillna(1.0).unstack().reindex(index=df_metadata.index, columns=value_cols).fillna(1.0)
+    scaled = factors.columns[(factors != 1.0).any()]
+    df_metadata[scaled] = df_metadata[scaled] * factors[scaled]
+    return df_metadata
+
+
 def metadata():
     """
     Access to chromatographic column data
 
     This function reads chromatographic column metadata from TSV files in the '../data/*/' directory,
     concatenates them into a single DataFrame, and processes the data to ensure that all eluents are in
-    the same units (%) and to generate a new column with the number of missing values.
+    the same units (%) and to generate a new column with the number of missing values. The result is cached
+    and only read again when a metadata file is added, removed or modified.
 
     Returns:
         tuple: A tuple containing two DataFrames:
@@ -155,37 +222,25 @@ def metadata():
     """
     try:
         directory = glob("external/RepoRT/processed_data/*/*.tsv")
+        files = [file for file in directory if re.search(r"_metadata.tsv", file)]
+        cache_key = tuple(sorted((file, os.stat(file).st_mtime_ns) for file in files))
+        if cache_key in _METADATA_CACHE:
+            column_data, eluent_data = _METADATA_CACHE[cache_key]
+            return column_data.copy(), eluent_data.copy()
+
         metadata_list = []
-        for file in directory:
-            if re.search(r"_metadata.tsv", file):
-                met = pd.read_csv(file, sep='\t', header=0, encoding='utf-8')
-                metadata_list.append(met)
+        for file in files:
+            met = pd.read_csv(file, sep='\t', header=0, encoding='utf-8')
+            metadata_list.append(met)
         df_metadata = pd.concat(metadata_list, ignore_index=True)
         df_metadata = df_metadata.set_index("id")
-        position = [pos for pos, col in enumerate(df_metadata.columns) if "unit" in col]
-        for pos in position:
-            if df_metadata.iloc[:, pos].notna().any() and df_metadata.iloc[:, pos].str.contains("mM").any():
-                if "nh4ac" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 0.007
-                elif "nh4form" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 0.005
-                elif "nh4carb" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 0.006
-                elif "nh4bicarb" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 0.005
-                elif "nh4form" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 0.004
-                elif "nh4oh" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 0.004
-            elif df_metadata.iloc[:, pos].notna().any() and df_metadata.iloc[:, pos].str.contains("µM").any():
-                if "phosphor" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 5.21 / (10 ** 6)
-                elif "medronic" in df_metadata.columns[pos - 1]:
-                    df_metadata.iloc[:, pos - 1] *= 8.38 / (10 ** 6)
+        df_metadata = normalize_units(df_metadata)
         columns_unit = [col for col in df_metadata.columns if '.unit' in col or "gradient." in col]
-        column_data = df_metadata.iloc[:, 0:8]
+        column_data = df_metadata.iloc[:, 0:8].copy()
         column_data["missing_values"] = column_data.isnull().sum(axis=1)
         eluent_data = df_metadata.iloc[:, 8:].drop(columns=columns_unit)
-        return column_data, eluent_data
+        _METADATA_CACHE.clear()
+        _METADATA_CACHE[cache_key] = (column_data, eluent_data)
+        return column_data.copy(), eluent_data.copy()
     except Exception as e:
         print(f"Error metadata:{e}")
@@ -0,0 +1,131 @@
+import os
+import re
+import sys
+
+try:
+    import psutil
+except ImportError:  # psutil es opcional: sin él se usa /proc o resource
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # no existe en Windows
+    resource = None
+
+
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(size):
+    """
+    Converts a size like "4G", "512M", "800MB" or "1073741824" to bytes.
+
+    Args:
+        size (str | int): Size with an optional K/M/G/T suffix (powers of 1024).
+
+    Returns:
+        int: Size in bytes.
+    """
+    if isinstance(size, int):
+        return size
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", str(size), flags=re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Tamaño no válido: {size} (ejemplos: 4G, 512M, 1073741824)")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def current_rss():
+    """
+    Returns the resident memory of the current process in bytes, or None if it cannot be measured.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of the current process in bytes, or None if it cannot be measured.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KiB y macOS en bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    return None
+
+
+class AdaptiveBlockSize:
+    """
+    Chooses the size in bytes of the blocks of the classified file to stay under a memory budget.
+
+    After every block the resident memory (RSS) is measured: if it is close to the budget the block size is
+    halved, and if there is plenty of room left it grows by 50 % to reduce the per-block overhead. Calling
+    the object returns the size to use for the next block.
+
+    Args:
+        budget (int): Memory budget in bytes for the whole process.
+        initial (int, optional): Size of the first block. Default value None, a twentieth of the memory that is
+        still free under the budget.
+        minimum (int, optional): Smallest block size. Default value 1 MiB.
+        maximum (int, optional): Largest block size. Default value None, a quarter of the budget.
+    """
+
+    SHRINK_ABOVE = 0.9
+    GROW_BELOW = 0.6
+
+    def __init__(self, budget, initial=None, minimum=1 << 20, maximum=None):
+        self.budget = budget
+        self.minimum = minimum
+        self.maximum = maximum if maximum is not None else max(minimum, budget // 4)
+        rss = current_rss()
+        self.peak = rss or 0
+        if initial is None:
+            free = budget - (rss or 0)
+            if free <= 0:
+                print(f"Aviso: el proceso ya usa {_mb(rss)} MB, más que el presupuesto de {_mb(budget)} MB")
+            initial = free // 20
+        self.block_bytes = min(max(int(initial), minimum), self.maximum)
+        self.sizes = [self.block_bytes]
+
+    def __call__(self):
+        return self.block_bytes
+
+    def update(self):
+        """
+        Measures the memory after a block and adjusts the size of the next one.
+        """
+        rss = current_rss()
+        if rss is None:
+            return self.block_bytes
+        self.peak = max(self.peak, rss)
+        if rss > self.SHRINK_ABOVE * self.budget:
+            new = max(self.minimum, self.block_bytes // 2)
+        elif rss < self.GROW_BELOW * self.budget:
+            new = min(self.maximum, int(self.block_bytes * 1.5))
+        else:
+            new = self.block_bytes
+        if new != self.block_bytes:
+            print(f"RSS {_mb(rss)} MB de {_mb(self.budget)} MB: bloque {_mb(self.block_bytes)} -> {_mb(new)} MB")
+            self.block_bytes = new
+            self.sizes.append(new)
+        return self.block_bytes
+
+    def report(self):
+        """
+        Prints the block sizes that were used and the peak memory of the run.
+        """
+        peak = max(self.peak, peak_rss() or 0)
+        print(f"Tamaños de bloque usados (MB): {', '.join(str(_mb(s)) for s in self.sizes)} "
+              f"(mín {_mb(min(self.sizes))}, máx {_mb(max(self.sizes))}, último {_mb(self.block_bytes)})")
+        print(f"Pico de memoria: {_mb(peak)} MB (presupuesto {_mb(self.budget)} MB)")
+
+
+def _mb(n):
+    return round(n / (1 << 20), 1) if n is not None else None
@@ -1,16 +1,27 @@
+import json
+import os
 import pandas as pd
 import re
+import time
 from glob import glob
 from pathlib import Path
 from itertools import islice
 from temporal.Update_RepoRT import ensure_processed_data_updated
+from temporal.Memory_Budget import AdaptiveBlockSize, parse_size
+from temporal.Star_Schema import (STAR_FILES, write_star_dimensions, read_star_schema, split_star_block,
+                                  read_star_keys)
 
 
 def optimiced_alternative_parents(
     classified_path="sampled_classified.tsv",
     out_path="RepoRT_classified_testOptimiced.tsv",
     lines_per_block=1000,
-    encoding="utf-8"
+    encoding="utf-8",
+    reader="python",
+    block_bytes=64 << 20,
+    resume=False,
+    layout="wide",
+    memory_budget=None
 ):
     #processed_path = ensure_processed_data_updated()
     processed_path=Path("external/RepoRT/processed_data/processed_data")
@@ -46,84 +57,252 @@ def optimiced_alternative_parents(
     if not classified_path.exists():
         raise FileNotFoundError(f"No encuentro {classified_path.resolve()}")
 
-    out_path = Path(out_path)
-    if out_path.exists():
-        out_path.unlink()
-
-    wrote_header = False
-    total_rows = 0
-
-    with open(classified_path, "r", encoding=encoding, errors="replace") as f:
-        block_number = 0
+    if reader not in ("python", "arrow"):
+        raise ValueError(f"Lector desconocido: {reader} (usa 'python' o 'arrow')")
+    if layout not in ("wide", "star"):
+        raise ValueError(f"Formato de salida desconocido: {layout} (usa 'wide' o 'star')")
 
-        while True:
-            block_lines = list(islice(f, lines_per_block))
-            if not block_lines:
-                break
-
-            block_number += 1
-            df_list_block = []
-
-            for line in block_lines:
-                line = line.rstrip("\n")
-                if not line:
-                    continue
-
-                lines = line.split("\t")  # EXACTAMENTE igual que el original
-                key = lines[0].strip()
-
-                mask = inchikey_series == key  # Changed to exact match
-                if not mask.any():
+    out_path = Path(out_path)
+    ckpt_path = _checkpoint_path(out_path)
+    if layout == "wide":
+        outputs = {"wide": out_path}
+        ragged = "wide"
+    else:
+        star_dir = out_path.parent / f"{out_path.stem}_star"
+        outputs = {name: star_dir / file for name, file in STAR_FILES.items()}
+        ragged = "molecules"
+    if memory_budget is not None:
+        memory_budget = parse_size(memory_budget)
+        if resume:
+            # Los bloques dependen de la memoria medida y cada bloque se rellena hasta su propio ancho:
+            # al reanudar el archivo podría no ser idéntico al de una ejecución sin interrupciones
+            raise ValueError("--resume no se puede combinar con --memory-budget: los bloques dependen de la "
+                             "memoria medida y la salida no sería idéntica. Usa --blocksize para poder reanudar.")
+    run_params = {
+        "classified": str(classified_path.resolve()),
+        "classified_bytes": classified_path.stat().st_size,
+        "classified_mtime_ns": classified_path.stat().st_mtime_ns,
+        "reader": reader,
+        "lines_per_block": lines_per_block if reader == "python" and memory_budget is None else None,
+        "block_bytes": block_bytes if reader == "arrow" and memory_budget is None else None,
+        "layout": layout,
+        "memory_budget": memory_budget,
+    }
+
+    state = None
+    if resume and ckpt_path.exists():
+        state = _load_checkpoint(ckpt_path, run_params, outputs)
+    elif resume:
+        existing = [str(path) for path in outputs.values() if path.exists()]
+        if existing:
+            # Sin checkpoint la salida está terminada o no es de esta ejecución: no borrarla
+            raise ValueError(f"No hay checkpoint en {ckpt_path} pero la salida ya existe ({', '.join(existing)}). "
+                             f"Bórrala o ejecuta sin --resume.")
+        print(f"No hay checkpoint en {ckpt_path}, empiezo desde el principio.")
+
+    seen = {}
+    if state is None:
+        for path in outputs.values():
+            if path.exists():
+                path.unlink()
+        if layout == "star":
+            schema = write_star_dimensions(df_concat, star_dir)
+        state = dict(run_params, input_offset=0, block_number=0, max_cols=0, total_rows=0, finished=False,
+                     output_bytes={name: (path.stat().st_size if path.exists() else 0)
+                                   for name, path in outputs.items()})
+    else:
+        print(f"Reanudando desde el bloque {state['block_number']} (byte {state['input_offset']} de la entrada)")
+        if layout == "star":
+            schema = read_star_schema(star_dir)
+            seen = read_star_keys(outputs["molecules"], state["max_cols"], encoding=encoding)
+
+    # Con presupuesto de memoria los bloques se miden en bytes y su tamaño se ajusta tras cada bloque
+    sizer = None
+    if memory_budget is not None:
+        sizer = AdaptiveBlockSize(memory_budget)
+
+    total_lines = 0
+    start = time.perf_counter()
+
+    def flush_block(df_block, input_offset):
+        # Añadir el bloque, forzarlo a disco y después guardar el checkpoint
+        if df_block is not None:
+            state["total_rows"] += len(df_block)
+            parts = {"wide": df_block} if layout == "wide" else split_star_block(df_block, schema, seen)
+            for name, df_part in parts.items():
+                if df_part.empty:
                     continue
-
-                df_query = df_concat.loc[mask].copy()
-                df_query.loc[:, "inchikey.std"] = key
-
-                df_at = pd.DataFrame(lines).transpose()  # EXACTAMENTE igual
-                merged = pd.merge(df_query, df_at, right_on=0, left_on="inchikey.std")
-
-                df_list_block.append(merged)
-
-            if df_list_block:
-                df_block = pd.concat(df_list_block, ignore_index=True)
-
-                df_block.to_csv(
-                    out_path,
+                path = outputs[name]
+                df_part.to_csv(
+                    path,
                     sep="\t",
                     index=False,
                     mode="a",
-                    header=(not wrote_header)
+                    header=(state["output_bytes"][name] == 0)
                 )
-                wrote_header = True
-                total_rows += len(df_block)
-
-            print(f"Bloque {block_number} procesado")
-
-    if not wrote_header:
+                with open(path, "rb+") as fo:
+                    os.fsync(fo.fileno())
+                state["output_bytes"][name] = path.stat().st_size
+                if name == ragged:
+                    state["max_cols"] = max(state["max_cols"], df_part.shape[1])
+        state["block_number"] += 1
+        state["input_offset"] = input_offset
+        if sizer is not None:
+            sizer.update()
+        _save_checkpoint(ckpt_path, state)
+        print(f"Bloque {state['block_number']} procesado")
+
+    if state["finished"]:
+        pass
+    elif reader == "arrow":
+        # Import aquí para que pyarrow solo sea necesario con --reader arrow
+        import pyarrow as pa
+        from temporal.Classified_Reader import read_classified_arrow, join_classified_batch
+
+        df_rt = df_concat.assign(**{"inchikey.std": inchikey_series})
+        keys = pa.array(inchikey_series.unique())
+
+        for batch, input_offset in read_classified_arrow(classified_path, block_bytes=sizer or block_bytes,
+                                                         encoding=encoding, start_offset=state["input_offset"]):
+            total_lines += batch.num_rows
+            flush_block(join_classified_batch(batch, df_rt, keys), input_offset)
+
+    else:
+        # Lectura en binario para conocer el offset exacto de cada bloque
+        with open(classified_path, "rb") as f:
+            f.seek(state["input_offset"])
+            input_offset = state["input_offset"]
+
+            while True:
+                if sizer is not None:
+                    block_lines = f.readlines(sizer())
+                else:
+                    block_lines = list(islice(f, lines_per_block))
+                if not block_lines:
+                    break
+
+                input_offset += sum(len(raw) for raw in block_lines)
+                df_list_block = []
+
+                for raw in block_lines:
+                    line = raw.decode(encoding, errors="replace").rstrip("\r\n")
+                    if not line:
+                        continue
+                    total_lines += 1  # igual que pyarrow, sin contar las líneas vacías
+
+                    lines = line.split("\t")  # EXACTAMENTE igual que el original
+                    key = lines[0].strip()
+
+                    mask = inchikey_series == key  # Changed to exact match
+                    if not mask.any():
+                        continue
+
+                    df_query = df_concat.loc[mask].copy()
+                    df_query.loc[:, "inchikey.std"] = key
+
+                    df_at = pd.DataFrame(lines).transpose()  # EXACTAMENTE igual
+                    merged = pd.merge(df_query, df_at, right_on=0, left_on="inchikey.std")
+
+                    df_list_block.append(merged)
+
+                df_block = pd.concat(df_list_block, ignore_index=True) if df_list_block else None
+                flush_block(df_block, input_offset)
+
+    elapsed = time.perf_counter() - start
+    print(f"Lector {reader}: {total_lines} líneas en {elapsed:.1f} s "
+          f"({total_lines / max(elapsed, 1e-9):.0f} líneas/s)")
+    if sizer is not None:
+        sizer.report()
+
+    state["finished"] = True
+    _save_checkpoint(ckpt_path, state)
+
+    if state["output_bytes"][ragged] == 0:
         print("No hubo matches.")
+        ckpt_path.unlink()
         return None
 
     print("Alternative Parents Proccess finished")
-    fix_header_extend(out_path, encoding=encoding)
-    print("Total filas escritas:", total_rows)
+    fix_header_extend(outputs[ragged], encoding=encoding, max_cols=state["max_cols"])
+    ckpt_path.unlink()
+    print("Total filas escritas:", state["total_rows"])
+    if layout == "star":
+        for name, path in outputs.items():
+            print(f"  {name}: {path.stat().st_size} bytes")
+        print("Guardado en:", star_dir.resolve())
+        return star_dir.resolve()
     print("Guardado en:", out_path.resolve())
 
 
     return out_path.resolve()
 
-    
+
+def _checkpoint_path(out_path):
+    out_path = Path(out_path)
+    return out_path.with_suffix(out_path.suffix + ".ckpt")
+
+
+def _save_checkpoint(ckpt_path, state):
+    """
+    Writes the checkpoint atomically: a temporary file is synced to disk and then renamed.
+    """
+    tmp = ckpt_path.with_suffix(ckpt_path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp.replace(ckpt_path)
+
+
+def _load_checkpoint(ckpt_path, run_params, outputs):
+    """
+    Loads a checkpoint and truncates the output files to the last block it records.
+
+    Args:
+        ckpt_path (Path): Path to the checkpoint file.
+        run_params (dict): Input file, reader, block size and layout of the current run. They must be the same
+        as the ones of the checkpoint, otherwise the blocks would not match the ones already written.
+        outputs (dict): Paths of the output files by name.
+
+    Returns:
+        dict: State saved in the checkpoint.
+    """
+    with open(ckpt_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+
+    different = [k for k, v in run_params.items() if state.get(k) != v]
+    if different:
+        raise ValueError(f"El checkpoint {ckpt_path} no corresponde a esta ejecución (cambia: {', '.join(different)}). "
+                         f"Bórralo o ejecuta sin --resume.")
+
+    if state["finished"]:
+        # Solo faltaba ampliar el header, que no modifica el archivo hasta el replace final
+        return state
+
+    for name, path in outputs.items():
+        expected = state["output_bytes"][name]
+        size = path.stat().st_size if path.exists() else 0
+        if size < expected:
+            raise ValueError(f"{path} tiene {size} bytes y el checkpoint espera {expected}: no se puede reanudar.")
+        if size > expected:
+            # Quitar lo que se escribió de un bloque que no llegó a completarse
+            os.truncate(path, expected)
+    return state
+
+
 from pathlib import Path
 
-def fix_header_extend(path, encoding="utf-8"):
+def fix_header_extend(path, encoding="utf-8", max_cols=None):
     path = Path(path)
 
-    # 1) calcular el máximo número de columnas reales en TODO el archivo
-    max_cols = 0
-    with open(path, "r", encoding=encoding, errors="replace") as f:
-        for line in f:
-            n = line.rstrip("\n").count("\t") + 1
-            if n > max_cols:
-                max_cols = n
+    # 1) calcular el máximo número de columnas reales en TODO el archivo (si no lo sabemos ya)
+    if max_cols is None:
+        max_cols = 0
+        with open(path, "r", encoding=encoding, errors="replace") as f:
+            for line in f:
+                n = line.rstrip("\n").count("\t") + 1
+                if n > max_cols:
+                    max_cols = n
 
     # 2) leer el header actual
     with open(path, "r", encoding=encoding, errors="replace") as f:
@@ -0,0 +1,209 @@
+import json
+import re
+from array import array
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+_CHEMONTID = re.compile(r"\((CHEMONTID:\d+)\)\s*$")
+_ARRAYS = ("keys", "offsets", "values", "rev_offsets", "rev_values")
+
+
+def build_parents_store(classified_path="all_classified.tsv", store_dir="parents_store", encoding="utf-8"):
+    """
+    Builds a dictionary-encoded store of the alternative parents in all_classified.tsv.
+
+    Every distinct parent term (e.g. "Flavonoids (CHEMONTID:0000334)") is interned to an integer id. The
+    parents of each molecule are kept CSR-style in two arrays: `values` holds the term ids of every
+    molecule one after another and `offsets[i]:offsets[i + 1]` delimits the ones of molecule i. Molecules
+    are sorted by InChIKey, and a reverse index with the same layout maps each term id to its molecules.
+    The lines of an InChIKey that appears several times are merged into one molecule with the union of
+    their parents.
+
+    Args:
+        classified_path (str | Path, optional): Path to the classified TSV file. Default value "all_classified.tsv".
+        store_dir (str | Path, optional): Directory where the store is saved. Default value "parents_store".
+        encoding (str, optional): Encoding of the classified file. Default value "utf-8".
+
+    Returns:
+        Path: Resolved path of the store directory.
+    """
+    classified_path = Path(classified_path)
+    if not classified_path.exists():
+        raise FileNotFoundError(f"No encuentro {classified_path.resolve()}")
+
+    term_ids = {}
+    terms = []
+    keys = []
+    lengths = array("q")
+    values = array("i")
+
+    with open(classified_path, "r", encoding=encoding, errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            fields = line.split("\t")
+            keys.append(fields[0].strip())
+            n = 0
+            for term in fields[1:]:
+                if not term:
+                    continue
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(terms)
+                    terms.append(term)
+                values.append(term_id)
+                n += 1
+            lengths.append(n)
+
+    # Codificar antes: errors="replace" puede dejar U+FFFD en las claves, que no cabe en ASCII
+    keys = [k.encode("utf-8") for k in keys]
+    keys = np.array(keys, dtype=f"S{max((len(k) for k in keys), default=1)}")
+    lengths = np.frombuffer(lengths, dtype=np.int64)
+    values = np.frombuffer(values, dtype=np.int32)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    # Ordenar las líneas por InChIKey para poder buscarlas con searchsorted
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    new_lengths = lengths[order]
+    new_offsets = np.concatenate([[0], np.cumsum(new_lengths)])
+    starts = np.repeat(offsets[:-1][order] - new_offsets[:-1], new_lengths)
+    values = values[starts + np.arange(new_offsets[-1])]
+
+    # Una InChIKey repetida en varias líneas es una sola molécula: unión de sus términos sin repetir,
+    # en el orden en que aparecen en el archivo
+    keys, line_molecule = np.unique(keys, return_inverse=True)
+    value_molecule = np.repeat(line_molecule.ravel(), new_lengths)
+    _, keep = np.unique(value_molecule.astype(np.int64) * max(len(terms), 1) + values, return_index=True)
+    keep.sort()
+    values = values[keep]
+    new_lengths = np.bincount(value_molecule[keep], minlength=len(keys))
+    offsets = np.concatenate([[0], np.cumsum(new_lengths)])
+
+    # Índice inverso: término -> moléculas, con el mismo formato CSR
+    molecules = np.repeat(np.arange(len(keys), dtype=np.int32), new_lengths)
+    rev_order = np.argsort(values, kind="stable")
+    rev_values = molecules[rev_order]
+    rev_offsets = np.concatenate([[0], np.cumsum(np.bincount(values, minlength=len(terms)))])
+
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    np.save(store_dir / "keys.npy", keys)
+    np.save(store_dir / "offsets.npy", offsets.astype(np.int64))
+    np.save(store_dir / "values.npy", values.astype(np.int32))
+    np.save(store_dir / "rev_offsets.npy", rev_offsets.astype(np.int64))
+    np.save(store_dir / "rev_values.npy", rev_values.astype(np.int32))
+    with open(store_dir / "terms.json", "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+
+    print(f"Store creado: {len(keys)} moléculas, {len(terms)} términos, {len(values)} relaciones")
+    return store_dir.resolve()
+
+
+class ParentsStore:
+    """
+    Read-only access to a store created by `build_parents_store`.
+
+    The arrays are memory-mapped, so opening the store is immediate and only the pages that are queried
+    are read from disk.
+    """
+
+    def __init__(self, store_dir="parents_store"):
+        store_dir = Path(store_dir)
+        for name in _ARRAYS:
+            setattr(self, name, np.load(store_dir / f"{name}.npy", mmap_mode="r"))
+        with open(store_dir / "terms.json", "r", encoding="utf-8") as f:
+            self.terms = json.load(f)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        for i, term in enumerate(self.terms):
+            match = _CHEMONTID.search(term)
+            if match:
+                self.term_ids.setdefault(match.group(1), i)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def term_id(self, term):
+        """
+        Returns the id of a term given its full text or its CHEMONTID (e.g. "CHEMONTID:0000334").
+        """
+        try:
+            return self.term_ids[term]
+        except KeyError:
+            raise KeyError(f"Término no encontrado en el store: {term}") from None
+
+    def molecule_ids(self, inchikeys):
+        """
+        Returns the molecule id of every InChIKey, or -1 for the ones that are not in the store.
+        """
+        encoded = pd.Series(inchikeys, dtype=object).astype(str).str.strip().str.encode("utf-8")
+        # Las claves más largas que las del store no pueden estar: al convertirlas a Sn se truncarían
+        too_long = (encoded.str.len() > self.keys.dtype.itemsize).to_numpy()
+        encoded = np.asarray(encoded.where(~too_long, b"").to_numpy(), dtype=self.keys.dtype)
+        if len(self.keys) == 0:
+            return np.full(len(encoded), -1, dtype=np.int64)
+        pos = np.searchsorted(self.keys, encoded)
+        pos_clipped = np.minimum(pos, len(self.keys) - 1)
+        return np.where((self.keys[pos_clipped] == encoded) & ~too_long, pos_clipped, -1)
+
+    def parents_of(self, inchikey):
+        """
+        Returns the parent terms of a molecule, or an empty list if the InChIKey is not in the store.
+        """
+        mol = self.molecule_ids([inchikey])[0]
+        if mol < 0:
+            return []
+        return [self.terms[i] for i in self.values[self.offsets[mol]:self.offsets[mol + 1]]]
+
+    def molecules_under(self, term):
+        """
+        Returns the InChIKeys of every molecule that has `term` (full text or CHEMONTID) among its parents.
+        """
+        term_id = self.term_id(term)
+        mols = self.rev_values[self.rev_offsets[term_id]:self.rev_offsets[term_id + 1]]
+        return np.char.decode(self.keys[np.asarray(mols)], "utf-8")
+
+    def parents_frame(self, inchikeys):
+        """
+        Returns the parents of several molecules as integer ids, one row per (InChIKey, parent) pair.
+
+        Args:
+            inchikeys (iterable): InChIKeys to look up. Repeated keys are only returned once.
+
+        Returns:
+            DataFrame: DataFrame with the columns "inchikey.std" and "parent_id" (int32).
+        """
+        unique = pd.unique(pd.Series(inchikeys, dtype=object).astype(str).str.strip())
+        mols = self.molecule_ids(unique)
+        found = mols >= 0
+        unique, mols = unique[found], mols[found]
+        offsets = np.asarray(self.offsets)
+        lengths = offsets[mols + 1] - offsets[mols]
+        starts = np.repeat(offsets[mols] - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        values = np.asarray(self.values)[starts + np.arange(lengths.sum())]
+        return pd.DataFrame({"inchikey.std": np.repeat(unique, lengths), "parent_id": values})
+
+    def report_compounds_under(self, term, df_rt):
+        """
+        Filters RepoRT retention time data to the compounds that have `term` among their parents.
+
+        Args:
+            term (str): Full text of the term or its CHEMONTID.
+            df_rt (DataFrame): Retention time data with an "inchikey.std" column.
+
+        Returns:
+            DataFrame: Rows of `df_rt` whose molecule is under `term`.
+        """
+        term_id = self.term_id(term)
+        mols = self.molecule_ids(df_rt["inchikey.std"])
+        member = np.zeros(len(self.keys), dtype=bool)
+        member[np.asarray(self.rev_values[self.rev_offsets[term_id]:self.rev_offsets[term_id + 1]])] = True
+        return df_rt[(mols >= 0) & member[np.maximum(mols, 0)]]
+
+
+if __name__ == "__main__":
+    build_parents_store()
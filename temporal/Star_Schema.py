@@ -0,0 +1,152 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+
+
+# Archivos del formato "star" dentro de <salida>_star/
+STAR_FILES = {
+    "molecules": "molecules.tsv",
+    "studies": "studies.tsv",
+    "measurements": "measurements.tsv",
+}
+MEASUREMENT_COLUMNS = ["id", "study", "inchikey.std", "rt"]
+STUDY_COLUMNS = ["study", "gradient"]
+
+
+def write_star_dimensions(df_concat, star_dir):
+    """
+    Creates the star layout directory and writes the study/gradient dimension.
+
+    The study dimension holds one row per RepoRT study with its gradient, instead of copying the gradient
+    onto every measurement. The retention time columns are split between the two other tables: the ones
+    that are constant for every InChIKey go to the molecule dimension and the ones that change between
+    measurements (name, comment...) stay in the measurements fact table. The split and the column order are
+    saved in schema.json so that `wide_view` can rebuild the wide join.
+
+    Args:
+        df_concat (DataFrame): Concatenated retention time data of every study.
+        star_dir (str | Path): Directory of the star layout.
+
+    Returns:
+        dict: Schema of the layout (see `read_star_schema`).
+    """
+    star_dir = Path(star_dir)
+    star_dir.mkdir(parents=True, exist_ok=True)
+    df_concat[STUDY_COLUMNS].drop_duplicates("study").to_csv(
+        star_dir / STAR_FILES["studies"], sep="\t", index=False
+    )
+
+    others = [c for c in df_concat.columns if c not in MEASUREMENT_COLUMNS and c not in STUDY_COLUMNS]
+    key = df_concat["inchikey.std"].astype(str).str.strip()
+    constant = pd.Series(dtype=bool)
+    if others:
+        constant = df_concat[others].groupby(key).nunique(dropna=False).max() <= 1
+    schema = {
+        "rt_columns": list(df_concat.columns),
+        "molecule_columns": ["inchikey.std"] + [c for c in others if constant.get(c, True)],
+        "measurement_columns": [c for c in df_concat.columns
+                                if c in MEASUREMENT_COLUMNS or (c in others and not constant.get(c, True))],
+    }
+    with open(star_dir / "schema.json", "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+    return schema
+
+
+def read_star_schema(star_dir):
+    """
+    Reads schema.json of a star layout: the retention time columns in their original order and the ones
+    stored in the molecule dimension and in the measurements fact table.
+    """
+    with open(Path(star_dir) / "schema.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _molecule_content(df):
+    # Texto de la fila sin el relleno final, igual que queda escrito en molecules.tsv
+    return df.astype(object).fillna("").astype(str).agg("\t".join, axis=1).str.rstrip("\t")
+
+
+def split_star_block(df_block, schema, seen):
+    """
+    Splits a block of the wide join into the molecule dimension and the measurements fact table.
+
+    Every joined measurement goes to the fact table with the id of its molecule. A molecule (the per-compound
+    columns plus the classified line) is only written the first time it is seen, so its classification is
+    stored once no matter how many studies measured it. If an InChIKey appears on several classified lines
+    with different parents, each version gets its own id.
+
+    Args:
+        df_block (DataFrame): Wide join of a block: retention time columns followed by the fields of the
+        classified line numbered from 0 (the InChIKey).
+        schema (dict): Schema of the layout returned by `write_star_dimensions`.
+        seen (dict): Id of every molecule already written, by its content. It is updated with the new ones.
+
+    Returns:
+        dict: DataFrames "molecules" and "measurements" to append to their files.
+    """
+    line_columns = list(df_block.columns[len(schema["rt_columns"]):])
+    molecule_columns = schema["molecule_columns"] + line_columns[1:]
+    content = _molecule_content(df_block[molecule_columns])
+
+    new = ~content.isin(seen.keys()) & ~content.duplicated()
+    for text in content[new]:
+        seen[text] = len(seen)
+    molecules = df_block.loc[new, molecule_columns]
+    molecules.insert(0, "molecule", content[new].map(seen))
+
+    measurements = df_block[schema["measurement_columns"]].assign(molecule=content.map(seen).to_numpy())
+    return {"molecules": molecules, "measurements": measurements}
+
+
+def read_star_keys(molecules_path, max_cols, encoding="utf-8"):
+    """
+    Reads the molecules already written to the molecule dimension (used when a run is resumed).
+
+    The file is parsed as a TSV, so quoted fields get the same text that `split_star_block` used as key.
+
+    Args:
+        molecules_path (str | Path): Path to molecules.tsv.
+        max_cols (int): Maximum number of columns of its rows. The header is not extended until the end of
+        the run, so it can be shorter than some rows.
+        encoding (str, optional): Encoding of the file. Default value "utf-8".
+
+    Returns:
+        dict: Id of every molecule by its content, as used by `split_star_block`.
+    """
+    molecules_path = Path(molecules_path)
+    if not molecules_path.exists() or molecules_path.stat().st_size == 0:
+        return {}
+    df = pd.read_csv(molecules_path, sep="\t", encoding=encoding, header=None, skiprows=1,
+                     names=range(max_cols), dtype=str, keep_default_na=False)
+    content = _molecule_content(df.iloc[:, 1:])
+    return dict(zip(content, df[0].astype(int)))
+
+
+def wide_view(star_dir, chunksize=100000, encoding="utf-8"):
+    """
+    Rebuilds the wide join of `optimiced_alternative_parents` from the star layout.
+
+    The measurements are read lazily in chunks and joined with the study and molecule dimensions, giving the
+    same rows, in the same order, and columns as the wide output.
+
+    Args:
+        star_dir (str | Path): Directory of the star layout.
+        chunksize (int, optional): Number of measurements per chunk. Default value 100000.
+        encoding (str, optional): Encoding of the files. Default value "utf-8".
+
+    Yields:
+        DataFrame: Chunk of the wide join.
+    """
+    star_dir = Path(star_dir)
+    rt_columns = read_star_schema(star_dir)["rt_columns"]
+
+    studies = pd.read_csv(star_dir / STAR_FILES["studies"], sep="\t", encoding=encoding, dtype={"study": str})
+    molecules = pd.read_csv(star_dir / STAR_FILES["molecules"], sep="\t", encoding=encoding)
+    molecules.insert(1, "0", molecules.pop("inchikey.std"))
+    line_columns = [c for c in molecules.columns if c not in rt_columns and c != "molecule"]
+
+    for measurements in pd.read_csv(star_dir / STAR_FILES["measurements"], sep="\t", encoding=encoding,
+                                    dtype={"study": str}, chunksize=chunksize):
+        df = measurements.merge(studies, on="study", how="left").merge(molecules, on="molecule", how="left")
+        yield df[rt_columns + line_columns]